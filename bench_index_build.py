@@ -0,0 +1,58 @@
+"""Benchmark for the index snapshot build.
+
+Builds a snapshot from a synthetic corpus, then rebuilds it after changing a
+single category to measure the incremental path:
+
+    python bench_index_build.py --scripts 1000000 --workers 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import streamlit_app as app
+
+
+def synthetic_scripts(count, categories=20, seed=0):
+    """Return `count` scripts spread over `categories`, built from real script vocabulary"""
+    rng = random.Random(seed)
+    vocabulary = sorted({token for scripts in app.ACTUAL_SCRIPTS.values() for script in scripts
+                         for token in app.tokenize_script(script)})
+    per_category = count // categories
+    return {
+        f"category_{i:02d}": [
+            " ".join(rng.choice(vocabulary) for _ in range(rng.randint(6, 16))).capitalize() + "..."
+            for _ in range(per_category)
+        ]
+        for i in range(categories)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scripts", type=int, default=1_000_000, help="corpus size")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes writing corpus segments (default: all cores)")
+    args = parser.parse_args()
+
+    scripts = synthetic_scripts(args.scripts)
+
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        started = time.perf_counter()
+        app.build_index_snapshot(scripts, snapshot_dir, args.workers)
+        full_build = time.perf_counter() - started
+
+        first_category = next(iter(scripts))
+        scripts[first_category] = scripts[first_category] + ["This rate is only guaranteed until Friday..."]
+
+        started = time.perf_counter()
+        app.build_index_snapshot(scripts, snapshot_dir, args.workers)
+        incremental_build = time.perf_counter() - started
+
+    print(f"scripts:           {sum(len(s) for s in scripts.values()):,}")
+    print(f"full build:        {full_build:.2f}s")
+    print(f"incremental build: {incremental_build:.2f}s (1 of {len(scripts)} categories changed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Build and publish an index snapshot from the current knowledge base.
+
+Run this as a deploy step (or from cron) rather than letting servers rebuild:
+
+    python build_index.py --workers 8
+
+Running servers keep using the previously published snapshot until this
+finishes and CURRENT points at the new one.
+"""
+import argparse
+import os
+
+import streamlit_app as app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--snapshot-dir", default=app.SNAPSHOT_DIR, help="where snapshots are published")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes writing corpus segments (default: all cores)")
+    args = parser.parse_args()
+
+    name = app.build_index_snapshot(snapshot_dir=args.snapshot_dir, workers=args.workers)
+    print(f"published snapshot: {os.path.join(args.snapshot_dir, name)}")
+
+
+if __name__ == "__main__":
+    main()
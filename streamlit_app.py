@@ -4,8 +4,58 @@ import numpy as np
 import re
 from datetime import datetime
 import base64
+import html
 from io import BytesIO
 import json
+import logging
+import os
+import pickle
+import shutil
+import sys
+import mmap
+import struct
+import zlib
+import time
+import sqlite3
+import uuid
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing, contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are only serialized within a process
+    fcntl = None
+
+# Under `streamlit run` this module is __main__ and nothing configures its
+# logger, so give the app's own logger a handler and a level
+logger = logging.getLogger("decoder")
+if not logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_log_handler)
+    logger.setLevel(os.environ.get("DECODER_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+INSTRUMENTATION_INTERVAL = 60
+
+@st.cache_resource
+def _instrumentation_last_logged():
+    # Kept across reruns, which re-execute this module
+    return {}
+
+def log_instrumentation(name, figures):
+    """Log a named set of figures at DEBUG on every call, and at INFO at most
+    once per INSTRUMENTATION_INTERVAL seconds per process"""
+    now = time.monotonic()
+    last_logged = _instrumentation_last_logged()
+    logger.debug("%s: %s", name, figures)
+    if now - last_logged.get(name, -INSTRUMENTATION_INTERVAL) >= INSTRUMENTATION_INTERVAL:
+        last_logged[name] = now
+        logger.info("%s: %s", name, figures)
 
 # Page configuration
 st.set_page_config(
@@ -128,7 +178,1116 @@ ACTUAL_SCRIPTS = {
     ]
 }
 
+# What each script is designed to do, keyed by a phrase it contains
+SCRIPT_PURPOSES = {
+    "What keeps you up at night": "Create anxiety about retirement",
+    "How would you feel if you outlived": "Fear-based motivation",
+    "What's your biggest financial regret": "Find emotional triggers",
+    "When you say it's too expensive": "Overcome price objections",
+    "I hear you saying you want to think": "Prevent delay tactics",
+    "This rate is only guaranteed": "Create artificial urgency",
+    "When we set up your account": "Assume the sale is done"
+}
+
+# Suggested responses, keyed the same way as SCRIPT_PURPOSES
+COUNTER_SCRIPTS = {
+    "What keeps you up at night": "I'll share my concerns when I'm ready.",
+    "How would you feel if you outlived": "Let's focus on facts, not fears.",
+    "What's your biggest financial regret": "That's personal. Let's discuss your services.",
+    "When you say it's too expensive": "Price is important to me. What are my alternatives?",
+    "I hear you saying you want to think": "Yes, I need time to research independently.",
+    "This rate is only guaranteed": "I don't make financial decisions under pressure.",
+    "When we set up your account": "Stop. I haven't agreed to anything yet."
+}
+
+# Where derived data (corpus files, caches) is kept on disk
+DATA_DIR = os.environ.get("DECODER_DATA_DIR", ".decoder_data")
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+
+# Corpus file layout: a fixed header followed by uint32 sections and a UTF-8
+# string blob. Every string (script, category, purpose, counter, index token)
+# is interned once in the blob and referred to by its id everywhere else.
+#
+#   header           magic, format, version, strings, records, categories,
+#                    tokens, postings, blob length
+#   string_offsets   strings + 1 offsets into the blob
+#   records          records x (category, script, purpose, counter) string ids
+#   category_starts  categories + 1 record offsets (records are grouped)
+#   category_names   categories string ids
+#   token_ids        tokens string ids, sorted by token text
+#   posting_starts   tokens + 1 offsets into postings
+#   postings         record ids per token
+#   blob             concatenated UTF-8 strings
+CORPUS_MAGIC = b"KYEC"
+CORPUS_FORMAT = 1
+CORPUS_HEADER = struct.Struct("<4s8I")
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+def tokenize_script(text):
+    """Split a script into the lowercase tokens used by the search index"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def write_script_corpus(path, scripts, version):
+    """Write scripts, their purposes/counters and a search index to a corpus file"""
+    strings = []
+    string_ids = {}
+    
+    def intern(text):
+        if text not in string_ids:
+            string_ids[text] = len(strings)
+            strings.append(text)
+        return string_ids[text]
+    
+    records = array("I")
+    category_starts = array("I", [0])
+    category_names = array("I")
+    postings_by_token = {}
+    
+    # Same exact matching as get_script_purpose/get_counter_script, with the
+    # phrases lowercased and interned once instead of per script
+    known_phrases = [
+        (key.lower(), intern(get_script_purpose(key)), intern(get_counter_script(key))) for key in SCRIPT_PURPOSES
+    ]
+    no_match = (intern(get_script_purpose("")), intern(get_counter_script("")))
+    
+    for category, category_scripts in scripts.items():
+        category_id = intern(category)
+        category_names.append(category_id)
+        for script in category_scripts:
+            record_id = len(records) // 4
+            lowered = script.lower()
+            purpose_id, counter_id = next(((purpose_id, counter_id) for phrase, purpose_id, counter_id in known_phrases
+                                           if phrase in lowered), no_match)
+            records.extend([category_id, intern(script), purpose_id, counter_id])
+            for token in set(tokenize_script(script)):
+                postings_by_token.setdefault(token, []).append(record_id)
+        category_starts.append(len(records) // 4)
+    
+    token_ids = array("I")
+    posting_starts = array("I", [0])
+    postings = array("I")
+    for token in sorted(postings_by_token):
+        token_ids.append(intern(token))
+        postings.extend(postings_by_token[token])
+        posting_starts.append(len(postings))
+    
+    blob = bytearray()
+    string_offsets = array("I", [0])
+    for text in strings:
+        blob += text.encode("utf-8")
+        string_offsets.append(len(blob))
+    
+    sections = [string_offsets, records, category_starts, category_names, token_ids, posting_starts, postings]
+    if sys.byteorder != "little":
+        for section in sections:
+            section.byteswap()
+    
+    header = CORPUS_HEADER.pack(
+        CORPUS_MAGIC, CORPUS_FORMAT, version, len(strings), len(records) // 4,
+        len(category_names), len(token_ids), len(postings), len(blob)
+    )
+    
+    # Write to a private file and rename so readers never see a partial corpus
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for section in sections:
+            f.write(section.tobytes())
+        f.write(blob)
+    os.replace(tmp_path, path)
+
+def _uint32_section(buffer):
+    """View a little-endian uint32 section without copying it where possible"""
+    if sys.byteorder == "little":
+        return buffer.cast("I")
+    section = array("I", bytes(buffer))
+    section.byteswap()
+    return section
+
+class ScriptCorpus:
+    """Read-only, memory-mapped view of a corpus file.
+    
+    The file is mapped rather than read, so every server process on a host
+    shares one page-cache copy and opening it costs no parsing. Records are
+    decoded one at a time as they are asked for.
+    """
+    
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        if len(self._mmap) < CORPUS_HEADER.size:
+            raise ValueError(f"{path} is not a script corpus file")
+        (magic, file_format, self.version, string_count, self.record_count,
+         category_count, token_count, posting_count, blob_length) = CORPUS_HEADER.unpack_from(self._mmap, 0)
+        if magic != CORPUS_MAGIC or file_format != CORPUS_FORMAT:
+            raise ValueError(f"{path} is not a script corpus file")
+        
+        view = memoryview(self._mmap)
+        offset = CORPUS_HEADER.size
+        sections = []
+        for count in [string_count + 1, self.record_count * 4, category_count + 1, category_count,
+                      token_count, token_count + 1, posting_count]:
+            sections.append(_uint32_section(view[offset:offset + count * 4]))
+            offset += count * 4
+        (self._string_offsets, self._records, self._category_starts, self._category_names,
+         self._token_ids, self._posting_starts, self._postings) = sections
+        self._blob = view[offset:offset + blob_length]
+        self._vocabulary = None
+    
+    def _string(self, string_id):
+        start = self._string_offsets[string_id]
+        end = self._string_offsets[string_id + 1]
+        return str(self._blob[start:end], "utf-8")
+    
+    def categories(self):
+        """Return category keys in corpus order"""
+        return [self._string(string_id) for string_id in self._category_names]
+    
+    def category_records(self, category):
+        """Return the record ids belonging to a category"""
+        for index, string_id in enumerate(self._category_names):
+            if self._string(string_id) == category:
+                return range(self._category_starts[index], self._category_starts[index + 1])
+        return range(0)
+    
+    def record(self, record_id):
+        """Decode a single script record"""
+        base = record_id * 4
+        return {
+            "category": self._string(self._records[base]),
+            "script": self._string(self._records[base + 1]),
+            "purpose": self._string(self._records[base + 2]),
+            "counter": self._string(self._records[base + 3])
+        }
+    
+    def search(self, term):
+        """Return ids of records whose script contains term (case-insensitive)"""
+        term = term.lower()
+        query_tokens = set(tokenize_script(term))
+        if not query_tokens:
+            candidates = range(self.record_count)
+        else:
+            # Only the vocabulary is decoded up front; it is far smaller than the corpus
+            if self._vocabulary is None:
+                self._vocabulary = [self._string(string_id) for string_id in self._token_ids]
+            candidates = None
+            for query_token in query_tokens:
+                matches = set()
+                for index, token in enumerate(self._vocabulary):
+                    if query_token in token:
+                        matches.update(self._postings[self._posting_starts[index]:self._posting_starts[index + 1]])
+                candidates = matches if candidates is None else candidates & matches
+                if not candidates:
+                    return set()
+        
+        return {
+            record_id for record_id in candidates
+            if term in self._string(self._records[record_id * 4 + 1]).lower()
+        }
+
+ScriptMatch = namedtuple("ScriptMatch", ["key", "score", "purpose", "counter"])
+NO_SCRIPT_MATCH = ScriptMatch(None, 0.0, "Manipulate decision-making", "I need to think about this independently.")
+
+class SegmentedCorpus:
+    """Read-only view of an index snapshot's corpus, stored as one file per category.
+    
+    Each segment is an ordinary corpus file, so a build only rewrites the
+    categories that changed. Record ids run on across segments in manifest
+    order, so callers see a single corpus with the ScriptCorpus interface.
+    """
+    
+    def __init__(self, snapshot_path, manifest):
+        self.version = manifest["corpus_version"]
+        self._categories = []
+        self._segments = []
+        self._offsets = [0]
+        for category, filename in manifest["segments"]:
+            segment = ScriptCorpus(os.path.join(snapshot_path, "segments", filename))
+            self._categories.append(category)
+            self._segments.append(segment)
+            self._offsets.append(self._offsets[-1] + segment.record_count)
+        self.record_count = self._offsets[-1]
+        self._category_index = {category: index for index, category in enumerate(self._categories)}
+    
+    def categories(self):
+        """Return category keys in corpus order"""
+        return list(self._categories)
+    
+    def category_records(self, category):
+        """Return the record ids belonging to a category"""
+        index = self._category_index.get(category)
+        if index is None:
+            return range(0)
+        return range(self._offsets[index], self._offsets[index + 1])
+    
+    def record(self, record_id):
+        """Decode a single script record"""
+        index = bisect_right(self._offsets, record_id) - 1
+        return self._segments[index].record(record_id - self._offsets[index])
+    
+    def search(self, term):
+        """Return ids of records whose script contains term (case-insensitive)"""
+        matches = set()
+        for offset, segment in zip(self._offsets, self._segments):
+            matches.update(offset + record_id for record_id in segment.search(term))
+        return matches
+
+def normalize_phrase(text):
+    """Lowercase text and reduce punctuation to single spaces for fuzzy matching"""
+    return " ".join(re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split())
+
+def phrase_trigrams(text):
+    """Return the set of character trigrams in text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def substring_edit_distance(pattern, text):
+    """Return the fewest edits turning pattern into some substring of text.
+    
+    Uses Myers' bit-parallel algorithm, so the cost is one pass over text
+    regardless of the pattern length (up to the width of a Python int).
+    """
+    if not pattern:
+        return 0
+    mask = (1 << len(pattern)) - 1
+    high_bit = 1 << (len(pattern) - 1)
+    peq = {}
+    for i, char in enumerate(pattern):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    
+    pv, mv = mask, 0
+    score = best = len(pattern)
+    for char in text:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        if ph & high_bit:
+            score += 1
+        elif mh & high_bit:
+            score -= 1
+        # A match may start anywhere in text, so nothing is shifted in at the top row
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+        best = min(best, score)
+    return best
+
+class PhraseMatcher:
+    """Find catalog phrases inside text, tolerating typos and transcription noise.
+    
+    A character-trigram index narrows the catalog to the phrases sharing
+    enough trigrams with the text to possibly be within `max_error_rate`
+    edits of it; only the best few of those are checked with an
+    edit-distance scan. Long text is scanned in overlapping windows a little
+    over twice the longest phrase, so the trigram counts stay local to where
+    a phrase could actually occur.
+    
+    Each phrase's purpose and counter are stored alongside it, so matches
+    from an older snapshot never depend on the live script tables.
+    """
+    
+    max_candidates = 16
+    
+    def __init__(self, phrases, purposes, counters, max_error_rate=0.2):
+        self.phrases = list(phrases)
+        self.purposes = [purposes[phrase] for phrase in self.phrases]
+        self.counters = [counters[phrase] for phrase in self.phrases]
+        self._normalized = [normalize_phrase(phrase) for phrase in self.phrases]
+        self._max_distances = np.array([int(len(phrase) * max_error_rate) for phrase in self._normalized])
+        
+        postings = {}
+        trigram_counts = []
+        for phrase_id, phrase in enumerate(self._normalized):
+            trigrams = phrase_trigrams(phrase)
+            trigram_counts.append(len(trigrams))
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(phrase_id)
+        self._postings = {trigram: np.array(ids, dtype=np.int32) for trigram, ids in postings.items()}
+        
+        # Each edit destroys at most three of a phrase's trigrams, so an
+        # occurrence within k edits still shares this many with the text
+        self._min_shared = np.maximum(np.array(trigram_counts, dtype=np.int64) - 3 * self._max_distances, 1)
+        self._set_window()
+    
+    def _set_window(self):
+        # The longest stretch of text a phrase can match, insertions included
+        self._longest_match = max(
+            (len(phrase) + int(k) for phrase, k in zip(self._normalized, self._max_distances)), default=0
+        )
+        self._window_size = max(2 * self._longest_match, 64)
+    
+    def save(self, path):
+        """Write the matcher as plain arrays so it can be loaded without rebuilding"""
+        trigrams = sorted(self._postings)
+        offsets = np.cumsum([0] + [len(self._postings[trigram]) for trigram in trigrams])
+        postings = np.concatenate([self._postings[trigram] for trigram in trigrams]) if trigrams else np.array([], dtype=np.int32)
+        with open(path, "wb") as f:
+            np.savez(f, phrases=np.array(self.phrases, dtype=str), purposes=np.array(self.purposes, dtype=str),
+                     counters=np.array(self.counters, dtype=str), normalized=np.array(self._normalized, dtype=str),
+                     trigrams=np.array(trigrams, dtype=str), offsets=offsets, postings=postings,
+                     max_distances=self._max_distances, min_shared=self._min_shared)
+    
+    @classmethod
+    def load(cls, path):
+        """Read a matcher written by save()"""
+        with np.load(path) as data:
+            matcher = cls.__new__(cls)
+            matcher.phrases = data["phrases"].tolist()
+            matcher.purposes = data["purposes"].tolist()
+            matcher.counters = data["counters"].tolist()
+            matcher._normalized = data["normalized"].tolist()
+            matcher._max_distances = data["max_distances"]
+            matcher._min_shared = data["min_shared"]
+            offsets, postings = data["offsets"], data["postings"]
+            matcher._postings = {
+                trigram: postings[offsets[i]:offsets[i + 1]] for i, trigram in enumerate(data["trigrams"].tolist())
+            }
+        matcher._set_window()
+        return matcher
+    
+    def _windows(self, text):
+        if len(text) <= self._window_size:
+            yield text
+            return
+        # Consecutive windows overlap by the longest possible match, so every
+        # occurrence lies wholly inside at least one of them
+        stride = self._window_size - self._longest_match
+        for start in range(0, max(len(text) - self._longest_match + 1, 1), stride):
+            yield text[start:start + self._window_size]
+    
+    def _match_window(self, text):
+        hits = [self._postings[trigram] for trigram in phrase_trigrams(text) if trigram in self._postings]
+        if not hits:
+            return None, 0.0
+        
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.phrases))
+        margins = shared - self._min_shared
+        candidates = np.flatnonzero(margins >= 0)
+        if len(candidates) > self.max_candidates:
+            top = np.argpartition(-margins[candidates], self.max_candidates)[:self.max_candidates]
+            candidates = candidates[top]
+        
+        best_id, best_score = None, 0.0
+        for phrase_id in candidates:
+            phrase = self._normalized[phrase_id]
+            distance = substring_edit_distance(phrase, text)
+            if distance <= self._max_distances[phrase_id]:
+                score = 1.0 - distance / len(phrase)
+                if score > best_score:
+                    best_id, best_score = phrase_id, score
+        return best_id, best_score
+    
+    def match(self, text):
+        """Return the ScriptMatch for the best phrase found in text, or NO_SCRIPT_MATCH.
+        
+        The score is 1.0 for an exact hit and falls with each edit needed.
+        """
+        best_id, best_score = None, 0.0
+        for window in self._windows(normalize_phrase(text)):
+            phrase_id, score = self._match_window(window)
+            if score > best_score:
+                best_id, best_score = phrase_id, score
+                if score == 1.0:
+                    break
+        if best_id is None:
+            return NO_SCRIPT_MATCH
+        return ScriptMatch(self.phrases[best_id], best_score, self.purposes[best_id], self.counters[best_id])
+
+# Only the live snapshot and the one before it stay loaded
+@st.cache_resource(max_entries=2)
+def get_phrase_matcher(snapshot_path):
+    """Return the fuzzy matcher over the known script phrases from an index snapshot"""
+    return PhraseMatcher.load(os.path.join(snapshot_path, "matcher.npz"))
+
+SCRIPTS_PER_PAGE = 25
+
+def find_scripts(corpus, search_term, categories):
+    """Return (category, record ids) pairs for the scripts matching a search.
+    
+    Only ids are returned; callers decode the records they actually show.
+    """
+    if not search_term:
+        return [(category, corpus.category_records(category)) for category in categories]
+    matching_records = corpus.search(search_term)
+    return [
+        (category, array("I", [
+            record_id for record_id in corpus.category_records(category) if record_id in matching_records
+        ]))
+        for category in categories
+    ]
+
+def normalize_query(query):
+    """Lowercase a search query and collapse its whitespace"""
+    return " ".join(query.lower().split())
+
+def approximate_size(obj, _seen=None):
+    """Return the approximate number of bytes held by obj and its contents"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approximate_size(key, _seen) + approximate_size(value, _seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item, _seen) for item in obj)
+    return size
+
+class QueryCache:
+    """Process-wide LRU cache of script search results.
+    
+    Entries expire after `ttl` seconds and the least recently used are
+    evicted once `max_bytes` is exceeded. Results are tied to the corpus
+    version they were computed from; the first lookup against a new version
+    drops everything cached for the old one.
+    """
+    
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=3600):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _discard(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.bytes_used -= size
+    
+    def get_or_compute(self, key, version, compute):
+        """Return the cached result for key, calling compute() on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self.bytes_used = 0
+                self._version = version
+            
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                self._discard(key)
+            self.misses += 1
+        
+        value = compute()
+        size = approximate_size(value)
+        
+        with self._lock:
+            if version == self._version and size <= self.max_bytes:
+                if key in self._entries:
+                    self._discard(key)
+                self._entries[key] = (now + self.ttl, size, value)
+                self.bytes_used += size
+                while self.bytes_used > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+                    self.evictions += 1
+        return value
+    
+    def stats(self):
+        """Return hit-rate and size figures for instrumentation"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.bytes_used,
+            "evictions": self.evictions
+        }
+
+@st.cache_resource
+def get_query_cache():
+    """Return the search result cache shared by every session in this server process"""
+    return QueryCache()
+
+# Index snapshots: every structure derived from the knowledge base is built
+# into a numbered snapshot directory and published by rewriting CURRENT, so
+# servers switch over atomically and readers of an older snapshot are unaffected
+# Bumped whenever the files in a snapshot change shape; older snapshots are ignored
+SNAPSHOT_FORMAT = 2
+SNAPSHOTS_TO_KEEP = 3
+PARALLEL_BUILD_THRESHOLD = 50000
+
+def _checksum(data):
+    return zlib.crc32(json.dumps(data, sort_keys=True).encode("utf-8"))
+
+def knowledge_fingerprints(scripts=None):
+    """Return checksums of each part of the knowledge base that indexes derive from"""
+    scripts = ACTUAL_SCRIPTS if scripts is None else scripts
+    return {
+        "scripts": {category: _checksum(category_scripts) for category, category_scripts in scripts.items()},
+        "matchers": _checksum([SCRIPT_PURPOSES, COUNTER_SCRIPTS]),
+        "books": _checksum(TRAINING_BOOKS)
+    }
+
+def current_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """Return (name, manifest) of the published snapshot, or (None, None)"""
+    try:
+        with open(os.path.join(snapshot_dir, "CURRENT")) as f:
+            name = f.read().strip()
+        with open(os.path.join(snapshot_dir, name, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None, None
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        return None, None
+    return name, manifest
+
+def _write_segment(path, category, category_scripts, version):
+    write_script_corpus(path, {category: category_scripts}, version)
+
+def write_corpus_segments(segments, workers=1):
+    """Write (path, category, scripts, version) corpus segments, spreading large batches across processes.
+    
+    Only pass workers > 1 from a standalone process such as build_index.py;
+    forking the threaded Streamlit server is not safe.
+    """
+    total = sum(len(category_scripts) for _, _, category_scripts, _ in segments)
+    if workers is None or workers <= 1 or len(segments) < 2 or total < PARALLEL_BUILD_THRESHOLD:
+        for segment in segments:
+            _write_segment(*segment)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(segments))) as executor:
+            list(executor.map(_write_segment, *zip(*segments)))
+
+SNAPSHOT_NAME = re.compile(r"v(\d{6})")
+
+def _snapshot_sequences(snapshot_dir):
+    """Return the sequence numbers of every snapshot directory, published or not"""
+    return [
+        int(match.group(1)) for match in map(SNAPSHOT_NAME.fullmatch, os.listdir(snapshot_dir)) if match
+    ]
+
+def _reuse_file(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+_build_lock = threading.Lock()
+
+@contextmanager
+def snapshot_build_lock(snapshot_dir=SNAPSHOT_DIR):
+    """Hold the lock that allows one snapshot build at a time on this host"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with _build_lock, open(os.path.join(snapshot_dir, "BUILD.lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def build_index_snapshot(scripts=None, snapshot_dir=SNAPSHOT_DIR, workers=1):
+    """Build and publish an index snapshot, redoing only what changed.
+    
+    The corpus is written as one segment per category; segments whose
+    scripts are unchanged, and the phrase matcher, are carried over from the
+    published snapshot untouched when nothing they depend on changed.
+    Changed segments are written in parallel when workers > 1. Concurrent builds wait
+    for each other, and a build that finds the published snapshot already
+    up to date returns it. Returns the name of the published snapshot.
+    """
+    with snapshot_build_lock(snapshot_dir):
+        return _build_index_snapshot(scripts, snapshot_dir, workers)
+
+def _build_index_snapshot(scripts, snapshot_dir, workers):
+    started = time.perf_counter()
+    scripts = ACTUAL_SCRIPTS if scripts is None else scripts
+    fingerprints = knowledge_fingerprints(scripts)
+    previous_name, previous = current_snapshot(snapshot_dir)
+    if previous is not None and previous["fingerprints"] == fingerprints:
+        return previous_name
+    previous_dir = os.path.join(snapshot_dir, previous_name) if previous is not None else None
+    
+    build_dir = os.path.join(snapshot_dir, f".build-{os.getpid()}-{uuid.uuid4().hex[:8]}")
+    os.makedirs(build_dir)
+    try:
+        matchers_unchanged = previous is not None and previous["fingerprints"]["matchers"] == fingerprints["matchers"]
+        # Segments embed each script's purpose and counter, so none survive a matcher change
+        previous_segments = dict(previous.get("segments", [])) if matchers_unchanged else {}
+        
+        os.makedirs(os.path.join(build_dir, "segments"))
+        segments = []
+        changed = []
+        for index, (category, category_scripts) in enumerate(scripts.items()):
+            filename = f"{index:04d}.bin"
+            path = os.path.join(build_dir, "segments", filename)
+            segments.append([category, filename])
+            if (category in previous_segments
+                    and previous["fingerprints"]["scripts"].get(category) == fingerprints["scripts"][category]):
+                _reuse_file(os.path.join(previous_dir, "segments", previous_segments[category]), path)
+            else:
+                version = _checksum([category, fingerprints["scripts"][category], fingerprints["matchers"]])
+                changed.append((path, category, category_scripts, version))
+        write_corpus_segments(changed, workers)
+        
+        if matchers_unchanged:
+            _reuse_file(os.path.join(previous_dir, "matcher.npz"), os.path.join(build_dir, "matcher.npz"))
+        else:
+            PhraseMatcher(SCRIPT_PURPOSES, SCRIPT_PURPOSES, COUNTER_SCRIPTS).save(os.path.join(build_dir, "matcher.npz"))
+        
+        # Number past every snapshot directory on disk, not just the published
+        # one: a build that died before rewriting CURRENT leaves its directory
+        sequence = max([previous["sequence"] if previous is not None else 0] + _snapshot_sequences(snapshot_dir)) + 1
+        with open(os.path.join(build_dir, "manifest.json"), "w") as f:
+            json.dump({
+                "format": SNAPSHOT_FORMAT,
+                "sequence": sequence,
+                "fingerprints": fingerprints,
+                "corpus_version": _checksum([list(fingerprints["scripts"].items()), fingerprints["matchers"]]),
+                "segments": segments,
+                "rebuilt_categories": sorted(category for _, category, _, _ in changed),
+                "built_at": datetime.now().isoformat(timespec="seconds"),
+                "build_seconds": round(time.perf_counter() - started, 3)
+            }, f, indent=2)
+        
+        # Builds hold the build lock, so nothing else can have taken this name
+        name = f"v{sequence:06d}"
+        os.rename(build_dir, os.path.join(snapshot_dir, name))
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    
+    tmp_path = os.path.join(snapshot_dir, f"CURRENT.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(name)
+    os.replace(tmp_path, os.path.join(snapshot_dir, "CURRENT"))
+    
+    # Older snapshots stay readable by any process that already mapped them
+    old_snapshots = [f"v{number:06d}" for number in sorted(_snapshot_sequences(snapshot_dir)) if number != sequence]
+    for entry in old_snapshots[:-(SNAPSHOTS_TO_KEEP - 1) or None]:
+        shutil.rmtree(os.path.join(snapshot_dir, entry), ignore_errors=True)
+    
+    logger.info("Built index snapshot %s in %.3fs (rebuilt categories: %d)",
+                name, time.perf_counter() - started, len(changed))
+    return name
+
+@st.cache_resource
+def get_knowledge_fingerprints():
+    """Return knowledge_fingerprints() for this process's code, computed once"""
+    return knowledge_fingerprints()
+
+@st.cache_resource
+def check_snapshot_freshness(name, fingerprints_match):
+    """Log, once per process and snapshot, when it lags this process's knowledge base"""
+    if not fingerprints_match:
+        logger.warning("Index snapshot %s does not match this code's knowledge base; "
+                       "run build_index.py to publish a new one", name)
+
+@st.cache_resource(ttl=5)
+def get_index_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """Return the path of the published index snapshot.
+    
+    Serving processes only read CURRENT, at most every few seconds; new
+    snapshots are built out of band with build_index.py and picked up once
+    published. Only a host with no snapshot at all builds one here, so there
+    is something to serve. Resolve this once per run and pass it down.
+    """
+    name, manifest = current_snapshot(snapshot_dir)
+    if manifest is None:
+        name = build_index_snapshot(snapshot_dir=snapshot_dir)
+    else:
+        check_snapshot_freshness(name, manifest["fingerprints"] == get_knowledge_fingerprints())
+    return os.path.join(snapshot_dir, name)
+
+# Only the live snapshot and the one before it stay loaded
+@st.cache_resource(max_entries=2)
+def load_script_corpus(snapshot_path):
+    """Open the script corpus of an index snapshot, shared by every session"""
+    with open(os.path.join(snapshot_path, "manifest.json")) as f:
+        return SegmentedCorpus(snapshot_path, json.load(f))
+
+# Submission screening: cheap content checks first, then rate limits
+SUBMISSION_MAX_LENGTH = 5000
+SUBMISSION_BLOCKLIST = re.compile(
+    r"https?://|www\.|\b(?:viagra|casino|crypto giveaway|forex signals|click here)\b",
+    re.IGNORECASE
+)
+
+def screen_submission(*fields):
+    """Return a reason to reject a submission's text, or None if it looks genuine"""
+    text = " ".join(field.strip() for field in fields if field).strip()
+    if not text:
+        return "Please fill in the form before submitting."
+    if len(text) > SUBMISSION_MAX_LENGTH:
+        return f"Submissions are limited to {SUBMISSION_MAX_LENGTH:,} characters."
+    
+    words = text.lower().split()
+    if re.search(r"(.)\1{19,}", text) or (len(words) >= 8 and len(set(words)) / len(words) < 0.3):
+        return "This submission looks repetitive. Please describe what you heard in your own words."
+    if SUBMISSION_BLOCKLIST.search(text):
+        return "Links and promotional content can't be submitted."
+    return None
+
+class TokenBucket:
+    """Allow bursts of up to `capacity` requests, refilling at `rate` per second"""
+    
+    def __init__(self, capacity, rate, now):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+    
+    def take(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class SubmissionLimiter:
+    """Per-session and process-wide token buckets for form submissions.
+    
+    Session buckets are kept in LRU order and the least recently seen are
+    dropped beyond `max_sessions`, so memory stays bounded however many
+    clients connect. The global bucket caps what all sessions together can
+    push towards the writer.
+    """
+    
+    def __init__(self, session_capacity=5, session_rate=1 / 60, global_capacity=100, global_rate=5,
+                 max_sessions=10000):
+        self.session_capacity = session_capacity
+        self.session_rate = session_rate
+        self.max_sessions = max_sessions
+        self._global = TokenBucket(global_capacity, global_rate, time.monotonic())
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def allow(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._sessions.pop(session_id, None)
+            if bucket is None:
+                bucket = TokenBucket(self.session_capacity, self.session_rate, now)
+            self._sessions[session_id] = bucket
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            
+            if not bucket.take(now):
+                return False
+            if not self._global.take(now):
+                # Don't charge the session for a rejection it didn't cause
+                bucket.tokens += 1
+                return False
+            return True
+
+@st.cache_resource
+def get_submission_limiter():
+    """Return the limiter shared by every session in this server process"""
+    return SubmissionLimiter()
+
+def get_session_id():
+    """Return a stable id for the current browser session"""
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+def check_submission(*fields):
+    """Return a rejection message for a form submission, or None to accept it"""
+    rejection = screen_submission(*fields)
+    if rejection is None and not get_submission_limiter().allow(get_session_id()):
+        rejection = "You're submitting too quickly. Please wait a minute and try again."
+    return rejection
+
+# Submitted intel is stored raw and folded into hourly/daily rollups as it
+# arrives, so dashboards read a handful of pre-aggregated rows per bucket
+INTEL_DB_PATH = os.path.join(DATA_DIR, "intel.db")
+ROLLUP_BUCKETS = {"hour": 3600, "day": 86400}
+ROLLUP_DIMENSIONS = {
+    "Industry": "industry",
+    "Salesperson Type": "salesperson_type",
+    "Effectiveness": "effectiveness",
+    "Context Used": "context"
+}
+
+# The two script forms word the same situations differently; count them together
+ROLLUP_VALUE_ALIASES = {
+    "context": {
+        "When I said no": "When I objected",
+        "Closing attempt": "During close"
+    }
+}
+SUBMISSION_SAVE_ERROR = "We couldn't save your submission right now. Please try again in a moment."
+
+@st.cache_resource
+def init_intel_db(path=INTEL_DB_PATH):
+    """Create the intel database and its tables, once per process"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with closing(sqlite3.connect(path, timeout=10)) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                id INTEGER PRIMARY KEY,
+                form TEXT NOT NULL,
+                submitted_at INTEGER NOT NULL,
+                fields TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS intel_rollups (
+                bucket TEXT NOT NULL,
+                dimension TEXT NOT NULL,
+                bucket_start INTEGER NOT NULL,
+                value TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (bucket, dimension, bucket_start, value)
+            );
+        """)
+    return path
+
+def connect_intel_db(path=INTEL_DB_PATH):
+    """Open the intel database"""
+    init_intel_db(path)
+    return sqlite3.connect(path, timeout=10)
+
+def record_submission(form, fields, dimensions, submitted_at=None, path=INTEL_DB_PATH):
+    """Store a submission and count it in every hourly and daily rollup it belongs to.
+    
+    Returns False if the database could not be written (e.g. it stayed locked).
+    """
+    submitted_at = int(time.time() if submitted_at is None else submitted_at)
+    dimensions = {
+        dimension: ROLLUP_VALUE_ALIASES.get(dimension, {}).get(value, value)
+        for dimension, value in dimensions.items()
+    }
+    try:
+        with closing(connect_intel_db(path)) as conn, conn:
+            conn.execute(
+                "INSERT INTO submissions (form, submitted_at, fields) VALUES (?, ?, ?)",
+                (form, submitted_at, json.dumps(fields))
+            )
+            for bucket, seconds in ROLLUP_BUCKETS.items():
+                bucket_start = submitted_at - submitted_at % seconds
+                for dimension, value in dimensions.items():
+                    conn.execute(
+                        """INSERT INTO intel_rollups (bucket, dimension, bucket_start, value, count)
+                           VALUES (?, ?, ?, ?, 1)
+                           ON CONFLICT (bucket, dimension, bucket_start, value) DO UPDATE SET count = count + 1""",
+                        (bucket, dimension, bucket_start, value)
+                    )
+    except sqlite3.Error:
+        logger.exception("Could not record %s submission", form)
+        return False
+    return True
+
+@st.cache_data(ttl=60)
+def load_intel_trends(dimension, bucket="day", periods=90, path=INTEL_DB_PATH):
+    """Return submission counts per bucket (rows) and dimension value (columns)"""
+    now = int(time.time())
+    since = now - now % ROLLUP_BUCKETS[bucket] - (periods - 1) * ROLLUP_BUCKETS[bucket]
+    with closing(connect_intel_db(path)) as conn:
+        rows = conn.execute(
+            "SELECT bucket_start, value, count FROM intel_rollups "
+            "WHERE bucket = ? AND dimension = ? AND bucket_start >= ?",
+            (bucket, dimension, since)
+        ).fetchall()
+    
+    if not rows:
+        return pd.DataFrame()
+    
+    bucket_starts, values, counts = zip(*rows)
+    trends = pd.DataFrame({
+        "bucket_start": pd.to_datetime(np.array(bucket_starts), unit="s"),
+        "value": values,
+        "count": np.array(counts)
+    }).pivot_table(index="bucket_start", columns="value", values="count", aggfunc="sum", fill_value=0)
+    trends.columns.name = None
+    
+    # Include empty buckets so charts show zero rather than interpolating across gaps
+    all_buckets = pd.to_datetime(np.arange(since, now + 1, ROLLUP_BUCKETS[bucket]), unit="s")
+    return trends.reindex(all_buckets, fill_value=0).rename_axis("bucket_start")
+
+# Session memory budget: large transient artifacts (e.g. transcript analyses)
+# are spilled to disk and only a reference stays in st.session_state
+SESSION_SPILL_DIR = os.path.join(DATA_DIR, "session_spill")
+SESSION_MEMORY_BUDGET = 256 * 1024
+ARTIFACT_SPILL_SIZE = 32 * 1024
+MAX_SESSION_ARTIFACTS = 50
+SESSION_IDLE_SECONDS = 3600
+
+SpilledArtifact = namedtuple("SpilledArtifact", ["path", "size"])
+
+def _session_artifacts():
+    if 'artifacts' not in st.session_state:
+        st.session_state.artifacts = OrderedDict()
+    return st.session_state.artifacts
+
+def _spill_artifact(key, value, size):
+    session_dir = os.path.join(SESSION_SPILL_DIR, get_session_id())
+    os.makedirs(session_dir, exist_ok=True)
+    path = os.path.join(session_dir, f"{zlib.crc32(key.encode('utf-8')):08x}.pkl")
+    
+    # Write to a private file and rename so readers never see a partial pickle
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return SpilledArtifact(path, size)
+
+def _drop_artifact(artifact):
+    if isinstance(artifact, SpilledArtifact):
+        try:
+            os.remove(artifact.path)
+        except OSError:
+            pass
+
+def stash_artifact(key, value):
+    """Keep a transient artifact for this session within the memory budget.
+    
+    Artifacts over ARTIFACT_SPILL_SIZE go straight to disk. Smaller ones
+    stay in memory until the session's in-memory artifacts exceed
+    SESSION_MEMORY_BUDGET, at which point the oldest are spilled.
+    """
+    artifacts = _session_artifacts()
+    if key in artifacts:
+        _drop_artifact(artifacts.pop(key))
+    
+    size = approximate_size(value)
+    artifacts[key] = _spill_artifact(key, value, size) if size > ARTIFACT_SPILL_SIZE else value
+    
+    while len(artifacts) > MAX_SESSION_ARTIFACTS:
+        _drop_artifact(artifacts.popitem(last=False)[1])
+    
+    in_memory = {k: v for k, v in artifacts.items() if not isinstance(v, SpilledArtifact)}
+    used = sum(approximate_size(v) for v in in_memory.values())
+    for old_key, old_value in in_memory.items():
+        if used <= SESSION_MEMORY_BUDGET:
+            break
+        old_size = approximate_size(old_value)
+        artifacts[old_key] = _spill_artifact(old_key, old_value, old_size)
+        used -= old_size
+
+def load_artifact(key, default=None):
+    """Return a stashed artifact, reading it back from disk if it was spilled"""
+    artifact = _session_artifacts().get(key, default)
+    if not isinstance(artifact, SpilledArtifact):
+        return artifact
+    try:
+        with open(artifact.path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        # Spill files of idle sessions are cleaned up and a damaged file is
+        # no better than a missing one; either way the caller recomputes
+        _session_artifacts().pop(key, None)
+        return default
+
+def sweep_session_spill(max_age=SESSION_IDLE_SECONDS, spill_dir=SESSION_SPILL_DIR):
+    """Delete spill directories untouched for max_age seconds, including those
+    left behind by earlier server processes"""
+    cutoff = time.time() - max_age
+    try:
+        entries = os.listdir(spill_dir)
+    except OSError:
+        return
+    for entry in entries:
+        path = os.path.join(spill_dir, entry)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+class SessionMemoryRegistry:
+    """Process-wide view of how much memory each session is holding.
+    
+    Sessions not seen for `idle_seconds` have their spill files deleted and
+    are flagged, so their in-memory artifacts are dropped by the session
+    itself on its next run (see release_evicted_artifacts). Abandoned spill
+    directories are swept every `sweep_seconds`.
+    """
+    
+    max_evicted = 100000
+    
+    def __init__(self, idle_seconds=SESSION_IDLE_SECONDS, sweep_seconds=600):
+        self.idle_seconds = idle_seconds
+        self.sweep_seconds = sweep_seconds
+        self._sessions = {}
+        self._evicted = OrderedDict()
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def update(self, session_id, in_memory, spilled):
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = (in_memory, spilled, now)
+            idle = [sid for sid, (_, _, seen) in self._sessions.items() if now - seen > self.idle_seconds]
+            for sid in idle:
+                del self._sessions[sid]
+                self._evicted[sid] = True
+            while len(self._evicted) > self.max_evicted:
+                self._evicted.popitem(last=False)
+            sweep_due = now - self._last_sweep > self.sweep_seconds
+            if sweep_due:
+                self._last_sweep = now
+        
+        # Mark this session's spill files as in use so sweeps leave them alone
+        try:
+            os.utime(os.path.join(SESSION_SPILL_DIR, session_id))
+        except OSError:
+            pass
+        
+        for sid in idle:
+            shutil.rmtree(os.path.join(SESSION_SPILL_DIR, sid), ignore_errors=True)
+        if sweep_due:
+            sweep_session_spill(self.idle_seconds)
+    
+    def pop_eviction(self, session_id):
+        """Return True (once) if the session was evicted while idle"""
+        with self._lock:
+            return self._evicted.pop(session_id, False)
+    
+    def totals(self):
+        """Return session count and total in-memory and spilled bytes"""
+        with self._lock:
+            sizes = list(self._sessions.values())
+        return {
+            "sessions": len(sizes),
+            "in_memory": sum(in_memory for in_memory, _, _ in sizes),
+            "spilled": sum(spilled for _, spilled, _ in sizes),
+            "largest_in_memory": max((in_memory for in_memory, _, _ in sizes), default=0)
+        }
+
+@st.cache_resource
+def get_session_memory_registry():
+    """Return the session memory registry shared by this server process"""
+    # Runs once per process, clearing out spill files from earlier processes
+    sweep_session_spill()
+    return SessionMemoryRegistry()
+
+def release_evicted_artifacts():
+    """Drop this session's artifacts if it was evicted while idle"""
+    if get_session_memory_registry().pop_eviction(get_session_id()):
+        _session_artifacts().clear()
+
+def report_session_memory():
+    """Measure this session's state and report it with the process totals"""
+    in_memory = approximate_size(dict(st.session_state.items()))
+    spilled = sum(a.size for a in _session_artifacts().values() if isinstance(a, SpilledArtifact))
+    registry = get_session_memory_registry()
+    registry.update(get_session_id(), in_memory, spilled)
+    log_instrumentation("Session memory", {
+        "session": get_session_id(),
+        "session_in_memory": in_memory,
+        "session_spilled": spilled,
+        **registry.totals()
+    })
+
 def main():
+    release_evicted_artifacts()
+    
     st.markdown('<h1 class="main-header">🎯 Know Your Enemy</h1>', unsafe_allow_html=True)
     st.markdown("**Exposing the sales training playbooks used against everyday consumers**")
     
@@ -139,10 +1298,11 @@ def main():
     if 'page' not in st.session_state:
         st.session_state.page = "🏠 Overview"
     
+    pages = ["🏠 Overview", "📖 Customer Centered Selling", "📚 Book Pipeline", "🎭 Script Database", "🕵️ Submit Intel", "📈 Intel Trends", "🧠 Training Techniques"]
     page = st.sidebar.selectbox(
         "Choose a section:",
-        ["🏠 Overview", "📖 Customer Centered Selling", "📚 Book Pipeline", "🎭 Script Database", "🕵️ Submit Intel", "🧠 Training Techniques"],
-        index=["🏠 Overview", "📖 Customer Centered Selling", "📚 Book Pipeline", "🎭 Script Database", "🕵️ Submit Intel", "🧠 Training Techniques"].index(st.session_state.page) if st.session_state.page in ["🏠 Overview", "📖 Customer Centered Selling", "📚 Book Pipeline", "🎭 Script Database", "🕵️ Submit Intel", "🧠 Training Techniques"] else 0
+        pages,
+        index=pages.index(st.session_state.page) if st.session_state.page in pages else 0
     )
     
     # Update session state when sidebar selection changes
@@ -158,8 +1318,12 @@ def main():
         script_database_page()
     elif page == "🕵️ Submit Intel":
         submit_intel_page()
+    elif page == "📈 Intel Trends":
+        intel_trends_page()
     elif page == "🧠 Training Techniques":
         training_techniques_page()
+    
+    report_session_memory()
 
 def overview_page():
     # Hero section matching Advisor Decoder style
@@ -484,7 +1648,17 @@ def book_pipeline_page():
         submit_suggestion = st.form_submit_button("📚 Submit Book Suggestion")
         
         if submit_suggestion:
-            st.success("Book suggestion received! Thank you for helping build the intelligence database.")
+            rejection = check_submission(suggested_title, suggested_author, why_important)
+            if rejection:
+                st.error(rejection)
+            elif not record_submission(
+                "suggest_book",
+                {"title": suggested_title, "author": suggested_author, "priority": urgency, "why_important": why_important},
+                {"industry": industry}
+            ):
+                st.error(SUBMISSION_SAVE_ERROR)
+            else:
+                st.success("Book suggestion received! Thank you for helping build the intelligence database.")
 
 def script_database_page():
     st.header("🎭 Script Database")
@@ -496,32 +1670,78 @@ def script_database_page():
     # Script categories
     script_category = st.selectbox("Category:", ["All", "Pain Discovery", "Objection Handling", "False Urgency", "Assumptive Close"])
     
+    category_map = {
+        "Pain Discovery": "pain_discovery",
+        "Objection Handling": "objection_handling", 
+        "False Urgency": "false_urgency",
+        "Assumptive Close": "assumptive_close"
+    }
+    
     # Filter scripts based on category
+    snapshot = get_index_snapshot()
+    corpus = load_script_corpus(snapshot)
     if script_category == "All":
-        display_scripts = ACTUAL_SCRIPTS
+        display_categories = corpus.categories()
     else:
-        category_map = {
-            "Pain Discovery": "pain_discovery",
-            "Objection Handling": "objection_handling", 
-            "False Urgency": "false_urgency",
-            "Assumptive Close": "assumptive_close"
-        }
-        display_scripts = {category_map[script_category]: ACTUAL_SCRIPTS[category_map[script_category]]}
+        display_categories = [category_map[script_category]]
     
-    # Display scripts
-    for category, scripts in display_scripts.items():
+    query = normalize_query(search_term)
+    query_cache = get_query_cache()
+    results = query_cache.get_or_compute(
+        (query, script_category, corpus.version), corpus.version,
+        lambda: find_scripts(corpus, query, display_categories)
+    )
+    log_instrumentation("Query cache", query_cache.stats())
+    
+    # Display scripts, decoding only the page of records being shown
+    for category, record_ids in results:
         category_title = category.replace("_", " ").title()
         
         with st.expander(f"🎭 {category_title} Scripts"):
-            for script in scripts:
-                if not search_term or search_term.lower() in script.lower():
-                    st.markdown(f"""
-                    <div style="background: #f8f9fa; border-left: 4px solid #c0392b; padding: 1rem; margin: 0.5rem 0; border-radius: 5px;">
-                        <strong>Script:</strong> "{script}"<br>
-                        <strong>Purpose:</strong> {get_script_purpose(script)}<br>
-                        <strong>Your Response:</strong> {get_counter_script(script)}
-                    </div>
-                    """, unsafe_allow_html=True)
+            page_count = max(1, -(-len(record_ids) // SCRIPTS_PER_PAGE))
+            page_number = 1
+            if page_count > 1:
+                page_number = st.number_input(f"Page (of {page_count:,})", min_value=1, max_value=page_count,
+                                              value=1, key=f"script_page_{category}")
+            start = (page_number - 1) * SCRIPTS_PER_PAGE
+            for record_id in record_ids[start:start + SCRIPTS_PER_PAGE]:
+                record = corpus.record(record_id)
+                st.markdown(f"""
+                <div style="background: #f8f9fa; border-left: 4px solid #c0392b; padding: 1rem; margin: 0.5rem 0; border-radius: 5px;">
+                    <strong>Script:</strong> "{record['script']}"<br>
+                    <strong>Purpose:</strong> {record['purpose']}<br>
+                    <strong>Your Response:</strong> {record['counter']}
+                </div>
+                """, unsafe_allow_html=True)
+    
+    # Decode a phrase the user heard, tolerating typos and mishearings
+    st.write("---")
+    st.subheader("🔍 Decode Something You Heard")
+    
+    transcript = st.text_area("What did the salesperson say? Paste a phrase or a whole conversation.",
+                              placeholder="e.g. What keeps you awake at night?", height=100,
+                              max_chars=TRANSCRIPT_MAX_LENGTH)
+    
+    if transcript:
+        analysis_key = f"transcript:{zlib.crc32(transcript.encode('utf-8')):08x}"
+        findings = load_artifact(analysis_key)
+        if findings is None:
+            findings = analyze_transcript(transcript, get_phrase_matcher(snapshot))
+            stash_artifact(analysis_key, findings)
+        
+        if not findings:
+            st.info("This doesn't match a script in our database yet. Consider submitting it below.")
+        for finding in findings:
+            matched_key = finding['key']
+            match_label = "Exact match" if finding['score'] == 1.0 else f"Approximate match ({finding['score']:.0%} similar)"
+            st.markdown(f"""
+            <div style="background: #f8f9fa; border-left: 4px solid #c0392b; padding: 1rem; margin: 0.5rem 0; border-radius: 5px;">
+                <strong>You heard:</strong> "{html.escape(finding['sentence'])}"<br>
+                <strong>Known script:</strong> "{matched_key}..." <em>({match_label})</em><br>
+                <strong>Purpose:</strong> {finding['purpose']}<br>
+                <strong>Your Response:</strong> "{finding['counter']}"
+            </div>
+            """, unsafe_allow_html=True)
     
     # Add new script section
     st.write("---")
@@ -536,41 +1756,66 @@ def script_database_page():
         submit_script = st.form_submit_button("🎭 Submit Script")
         
         if submit_script:
-            st.success("Script submitted! This will help other consumers recognize these tactics.")
+            rejection = check_submission(heard_script, script_effect)
+            if rejection:
+                st.error(rejection)
+            elif not record_submission(
+                "submit_script",
+                {"script": heard_script, "context": script_context, "effect": script_effect},
+                {"context": script_context}
+            ):
+                st.error(SUBMISSION_SAVE_ERROR)
+            else:
+                st.success("Script submitted! This will help other consumers recognize these tactics.")
 
-def get_script_purpose(script):
-    """Return the purpose of a given script"""
-    purpose_map = {
-        "What keeps you up at night": "Create anxiety about retirement",
-        "How would you feel if you outlived": "Fear-based motivation",
-        "What's your biggest financial regret": "Find emotional triggers",
-        "When you say it's too expensive": "Overcome price objections",
-        "I hear you saying you want to think": "Prevent delay tactics",
-        "This rate is only guaranteed": "Create artificial urgency",
-        "When we set up your account": "Assume the sale is done"
-    }
-    
-    for key, purpose in purpose_map.items():
+def match_script_key(script, fuzzy=False, matcher=None):
+    """Return the ScriptMatch for the known phrase a script contains.
+    
+    Exact substring hits score 1.0. With fuzzy=True, scripts with no exact
+    hit fall back to approximate matching (using `matcher`, or the published
+    snapshot's) and score below 1.0; those carry the purpose and counter
+    stored in the snapshot, which may predate the live script tables.
+    """
+    for key in SCRIPT_PURPOSES:
         if key.lower() in script.lower():
-            return purpose
-    return "Manipulate decision-making"
+            return ScriptMatch(key, 1.0, SCRIPT_PURPOSES[key], COUNTER_SCRIPTS[key])
+    if fuzzy:
+        if matcher is None:
+            matcher = get_phrase_matcher(get_index_snapshot())
+        return matcher.match(script)
+    return NO_SCRIPT_MATCH
 
-def get_counter_script(script):
+def get_script_purpose(script, fuzzy=False):
+    """Return the purpose of a given script"""
+    return match_script_key(script, fuzzy).purpose
+
+def get_counter_script(script, fuzzy=False):
     """Return suggested response to a script"""
-    counter_map = {
-        "What keeps you up at night": "I'll share my concerns when I'm ready.",
-        "How would you feel if you outlived": "Let's focus on facts, not fears.",
-        "What's your biggest financial regret": "That's personal. Let's discuss your services.",
-        "When you say it's too expensive": "Price is important to me. What are my alternatives?",
-        "I hear you saying you want to think": "Yes, I need time to research independently.",
-        "This rate is only guaranteed": "I don't make financial decisions under pressure.",
-        "When we set up your account": "Stop. I haven't agreed to anything yet."
-    }
-    
-    for key, counter in counter_map.items():
-        if key.lower() in script.lower():
-            return f'"{counter}"'
-    return '"I need to think about this independently."'
+    return f'"{match_script_key(script, fuzzy).counter}"'
+
+TRANSCRIPT_MAX_LENGTH = 5000
+TRANSCRIPT_WINDOW_WORDS = 40
+TRANSCRIPT_WINDOW_OVERLAP = 10
+
+def analyze_transcript(transcript, matcher=None):
+    """Return the known scripts found in each sentence of a transcript"""
+    if matcher is None:
+        matcher = get_phrase_matcher(get_index_snapshot())
+    findings = []
+    for sentence in re.split(r"(?<=[.!?;])\s+|\n+", transcript[:TRANSCRIPT_MAX_LENGTH]):
+        words = sentence.split()
+        previous_key = None
+        # Run-on sentences are matched in overlapping word windows
+        for start in range(0, max(len(words) - TRANSCRIPT_WINDOW_OVERLAP, 1), TRANSCRIPT_WINDOW_WORDS - TRANSCRIPT_WINDOW_OVERLAP):
+            passage = " ".join(words[start:start + TRANSCRIPT_WINDOW_WORDS])
+            if not passage:
+                continue
+            match = match_script_key(passage, fuzzy=True, matcher=matcher)
+            if match.key is not None and match.key != previous_key:
+                findings.append({"sentence": passage, "key": match.key, "score": match.score,
+                                 "purpose": match.purpose, "counter": match.counter})
+            previous_key = match.key
+    return findings
 
 def submit_intel_page():
     st.header("🕵️ Submit Sales Training Intel")
@@ -603,8 +1848,21 @@ def submit_intel_page():
             submit_book_intel = st.form_submit_button("🎯 Submit Training Material Intel")
             
             if submit_book_intel:
-                st.success("Intelligence received! This will help expose these tactics to protect other consumers.")
-                st.balloons()
+                rejection = check_submission(book_title, author_company, your_role, company_used,
+                                             tactics_observed, red_flags, additional_context)
+                if rejection:
+                    st.error(rejection)
+                elif not record_submission(
+                    "book_intel",
+                    {"title": book_title, "author_company": author_company, "industry": industry,
+                     "role": your_role, "company_used": company_used, "year": year_encountered,
+                     "tactics": tactics_observed, "red_flags": red_flags, "context": additional_context},
+                    {"industry": industry}
+                ):
+                    st.error(SUBMISSION_SAVE_ERROR)
+                else:
+                    st.success("Intelligence received! This will help expose these tactics to protect other consumers.")
+                    st.balloons()
     
     elif intel_type == "Actual Script Used":
         with st.form("script_intel"):
@@ -626,7 +1884,18 @@ def submit_intel_page():
             submit_script_intel = st.form_submit_button("🎭 Submit Script Intel")
             
             if submit_script_intel:
-                st.success("Script intelligence received! This helps build our defense database.")
+                rejection = check_submission(actual_script, company, your_response)
+                if rejection:
+                    st.error(rejection)
+                elif not record_submission(
+                    "script_intel",
+                    {"script": actual_script, "situation": situation, "salesperson_type": salesperson_type,
+                     "company": company, "effectiveness": effectiveness, "response": your_response},
+                    {"context": situation, "salesperson_type": salesperson_type, "effectiveness": effectiveness}
+                ):
+                    st.error(SUBMISSION_SAVE_ERROR)
+                else:
+                    st.success("Script intelligence received! This helps build our defense database.")
     
     # Display recent intel stats
     st.write("---")
@@ -651,6 +1920,32 @@ def submit_intel_page():
     st.write("• Building the most comprehensive database of sales manipulation tactics")
     st.markdown('</div>', unsafe_allow_html=True)
 
+def intel_trends_page():
+    st.header("📈 Intel Trends")
+    st.write("How submitted intelligence breaks down over time.")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        dimension_label = st.selectbox("Break down by:", list(ROLLUP_DIMENSIONS))
+    with col2:
+        granularity = st.radio("Granularity:", ["Daily (last 90 days)", "Hourly (last 48 hours)"], horizontal=True)
+    
+    if granularity.startswith("Daily"):
+        trends = load_intel_trends(ROLLUP_DIMENSIONS[dimension_label], "day", 90)
+    else:
+        trends = load_intel_trends(ROLLUP_DIMENSIONS[dimension_label], "hour", 48)
+    
+    if trends.empty:
+        st.info("No intel has been submitted for this period yet.")
+        return
+    
+    st.subheader(f"Submissions by {dimension_label}")
+    st.line_chart(trends)
+    
+    st.subheader("Totals for the Period")
+    st.bar_chart(trends.sum())
+
 def training_techniques_page():
     st.header("🧠 Sales Training Techniques")
     st.write("The psychological methods taught to salespeople to influence your decisions.")
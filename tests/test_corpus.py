@@ -0,0 +1,66 @@
+import pytest
+
+import streamlit_app as app
+
+SCRIPTS = {
+    "false_urgency": [
+        "This rate is only guaranteed until Friday...",
+        "Prices go up next week, so decide today",
+    ],
+    "empty": [],
+    "assumptive_close": [
+        "When we set up your account, which bank do you use?",
+        "Café owners love this plan — it's the one I'd pick",
+    ],
+}
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = tmp_path / "corpus.bin"
+    app.write_script_corpus(str(path), SCRIPTS, 1234)
+    return app.ScriptCorpus(str(path))
+
+
+def test_round_trip_keeps_categories_and_records(corpus):
+    assert corpus.version == 1234
+    assert corpus.record_count == 4
+    assert corpus.categories() == list(SCRIPTS)
+    assert corpus.category_records("empty") == range(2, 2)
+    assert corpus.category_records("missing") == range(0)
+    for category, scripts in SCRIPTS.items():
+        records = [corpus.record(record_id) for record_id in corpus.category_records(category)]
+        assert [record["script"] for record in records] == scripts
+        assert all(record["category"] == category for record in records)
+
+
+def test_records_carry_purpose_and_counter(corpus):
+    guaranteed = corpus.record(0)
+    assert guaranteed["purpose"] == app.SCRIPT_PURPOSES["This rate is only guaranteed"]
+    assert guaranteed["counter"] == f'"{app.COUNTER_SCRIPTS["This rate is only guaranteed"]}"'
+    unknown = corpus.record(1)
+    assert unknown["purpose"] == app.get_script_purpose("")
+    assert unknown["counter"] == app.get_counter_script("")
+
+
+def test_search_matches_substrings_case_insensitively(corpus):
+    assert corpus.search("GUARANTEED until") == {0}
+    assert corpus.search("account") == {2}
+    assert corpus.search("café") == {3}
+    assert corpus.search("you") == {2}
+    assert corpus.search("...") == {0}
+    assert corpus.search("not in any script") == set()
+
+
+def test_find_scripts_filters_each_category(corpus):
+    results = dict(app.find_scripts(corpus, "the", list(SCRIPTS)))
+    assert list(results["assumptive_close"]) == [3]
+    assert list(results["false_urgency"]) == []
+    assert list(dict(app.find_scripts(corpus, "", ["false_urgency"]))["false_urgency"]) == [0, 1]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "corpus.bin"
+    path.write_bytes(b"not a corpus file at all, just some bytes")
+    with pytest.raises(ValueError):
+        app.ScriptCorpus(str(path))
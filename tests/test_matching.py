@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+import streamlit_app as app
+
+
+def reference_substring_edit_distance(pattern, text):
+    """Plain dynamic programming: the first row is free, so a match may start anywhere in text"""
+    previous = [0] * (len(text) + 1)
+    for i, pattern_char in enumerate(pattern, 1):
+        current = [i]
+        for j, text_char in enumerate(text, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (pattern_char != text_char)))
+        previous = current
+    return min(previous)
+
+
+@pytest.mark.parametrize("pattern, text", [
+    ("", ""), ("", "abc"), ("abc", ""), ("abc", "abc"), ("abc", "xxabcxx"), ("abc", "axbxc"),
+])
+def test_substring_edit_distance_edge_cases(pattern, text):
+    assert app.substring_edit_distance(pattern, text) == reference_substring_edit_distance(pattern, text)
+
+
+def test_substring_edit_distance_matches_dynamic_programming():
+    rng = random.Random(0)
+    for _ in range(500):
+        pattern = "".join(rng.choice("abcd ") for _ in range(rng.randint(1, 70)))
+        text = "".join(rng.choice("abcd ") for _ in range(rng.randint(0, 120)))
+        assert app.substring_edit_distance(pattern, text) == reference_substring_edit_distance(pattern, text)
+
+
+@pytest.fixture
+def matcher():
+    return app.PhraseMatcher(app.SCRIPT_PURPOSES, app.SCRIPT_PURPOSES, app.COUNTER_SCRIPTS)
+
+
+def test_matcher_tolerates_typos(matcher):
+    match = matcher.match("so what keeps you up at nite, honestly?")
+    assert match.key == "What keeps you up at night"
+    assert 0.8 < match.score < 1.0
+    assert match.purpose == app.SCRIPT_PURPOSES["What keeps you up at night"]
+    assert match.counter == app.COUNTER_SCRIPTS["What keeps you up at night"]
+    assert matcher.match("lovely weather for a walk today") == app.NO_SCRIPT_MATCH
+
+
+def test_matcher_finds_phrases_deep_in_long_text(matcher):
+    filler = " ".join(["we talked about the weather and the drive over"] * 20)
+    assert matcher.match(f"{filler} this rate is only guarantied {filler}").key == "This rate is only guaranteed"
+
+
+def test_matcher_save_and_load_keep_details(matcher, tmp_path):
+    path = str(tmp_path / "matcher.npz")
+    matcher.save(path)
+    loaded = app.PhraseMatcher.load(path)
+    for text in ["when you say its to expensive", "When we set up your acount", "nothing relevant"]:
+        assert loaded.match(text) == matcher.match(text)
+
+
+def test_analyze_transcript_uses_the_matchers_details(monkeypatch):
+    renamed = app.PhraseMatcher({"What keeps you up at night": None},
+                                {"What keeps you up at night": "Stored purpose"},
+                                {"What keeps you up at night": "Stored counter"})
+    # A snapshot matcher may know phrases the live tables no longer have
+    monkeypatch.delitem(app.SCRIPT_PURPOSES, "What keeps you up at night")
+    monkeypatch.delitem(app.COUNTER_SCRIPTS, "What keeps you up at night")
+    findings = app.analyze_transcript("Hi there. What keeps you up at nite?", renamed)
+    assert [(finding["key"], finding["purpose"], finding["counter"]) for finding in findings] == [
+        ("What keeps you up at night", "Stored purpose", "Stored counter")
+    ]
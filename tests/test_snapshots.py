@@ -0,0 +1,122 @@
+import json
+import os
+
+import pytest
+
+import streamlit_app as app
+
+SCRIPTS = {
+    "pain_discovery": ["What keeps you up at night about money?", "How would you feel if you outlived your savings?"],
+    "false_urgency": ["This rate is only guaranteed until Friday..."],
+}
+
+
+def published(snapshot_dir):
+    with open(os.path.join(snapshot_dir, "CURRENT")) as f:
+        return f.read().strip()
+
+
+def manifest(snapshot_dir, name):
+    with open(os.path.join(snapshot_dir, name, "manifest.json")) as f:
+        return json.load(f)
+
+
+def load_corpus(snapshot_dir, name):
+    path = os.path.join(snapshot_dir, name)
+    return app.SegmentedCorpus(path, manifest(snapshot_dir, name))
+
+
+def corpus_scripts(corpus):
+    return {
+        category: [corpus.record(record_id)["script"] for record_id in corpus.category_records(category)]
+        for category in corpus.categories()
+    }
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path):
+    return str(tmp_path / "snapshots")
+
+
+def test_build_publishes_a_readable_snapshot(snapshot_dir):
+    name = app.build_index_snapshot(SCRIPTS, snapshot_dir)
+    assert name == "v000001"
+    assert published(snapshot_dir) == name
+    corpus = load_corpus(snapshot_dir, name)
+    assert corpus_scripts(corpus) == SCRIPTS
+    assert corpus.search("guaranteed") == {2}
+    assert app.PhraseMatcher.load(os.path.join(snapshot_dir, name, "matcher.npz")).phrases == list(app.SCRIPT_PURPOSES)
+
+
+def test_unchanged_knowledge_reuses_the_published_snapshot(snapshot_dir):
+    name = app.build_index_snapshot(SCRIPTS, snapshot_dir)
+    assert app.build_index_snapshot(SCRIPTS, snapshot_dir) == name
+    assert sorted(os.listdir(snapshot_dir)) == ["BUILD.lock", "CURRENT", name]
+
+
+def test_rebuild_rewrites_only_changed_categories(snapshot_dir):
+    first = app.build_index_snapshot(SCRIPTS, snapshot_dir)
+    changed = dict(SCRIPTS, false_urgency=SCRIPTS["false_urgency"] + ["Only two spots left at this price"])
+    second = app.build_index_snapshot(changed, snapshot_dir)
+
+    assert second == "v000002"
+    assert manifest(snapshot_dir, second)["rebuilt_categories"] == ["false_urgency"]
+    assert corpus_scripts(load_corpus(snapshot_dir, second)) == changed
+    # The old snapshot is still intact for processes that have it open
+    assert corpus_scripts(load_corpus(snapshot_dir, first)) == SCRIPTS
+
+    def segment(name, category):
+        return os.path.join(snapshot_dir, name, "segments", dict(manifest(snapshot_dir, name)["segments"])[category])
+    assert os.path.samefile(segment(first, "pain_discovery"), segment(second, "pain_discovery"))
+    assert not os.path.samefile(segment(first, "false_urgency"), segment(second, "false_urgency"))
+
+
+def test_build_numbers_past_orphaned_snapshot_directories(snapshot_dir):
+    app.build_index_snapshot(SCRIPTS, snapshot_dir)
+    # A build that died after renaming its directory but before publishing it
+    os.makedirs(os.path.join(snapshot_dir, "v000002"))
+    name = app.build_index_snapshot(dict(SCRIPTS, extra=["Sign here"]), snapshot_dir)
+    assert name == "v000003"
+    assert published(snapshot_dir) == name
+
+
+def test_failed_build_leaves_the_published_snapshot(snapshot_dir, monkeypatch):
+    name = app.build_index_snapshot(SCRIPTS, snapshot_dir)
+
+    def fail(segments, workers=1):
+        raise OSError("disk full")
+    monkeypatch.setattr(app, "write_corpus_segments", fail)
+    with pytest.raises(OSError):
+        app.build_index_snapshot(dict(SCRIPTS, extra=["Sign here"]), snapshot_dir)
+
+    assert published(snapshot_dir) == name
+    assert sorted(os.listdir(snapshot_dir)) == ["BUILD.lock", "CURRENT", name]
+
+
+def test_snapshots_in_an_older_format_are_rebuilt(snapshot_dir):
+    os.makedirs(os.path.join(snapshot_dir, "v000001"))
+    with open(os.path.join(snapshot_dir, "v000001", "manifest.json"), "w") as f:
+        json.dump({"sequence": 1, "fingerprints": app.knowledge_fingerprints(SCRIPTS)}, f)
+    with open(os.path.join(snapshot_dir, "CURRENT"), "w") as f:
+        f.write("v000001")
+
+    assert app.current_snapshot(snapshot_dir) == (None, None)
+    name = app.build_index_snapshot(SCRIPTS, snapshot_dir)
+    assert name == "v000002"
+    assert corpus_scripts(load_corpus(snapshot_dir, name)) == SCRIPTS
+
+
+def test_old_snapshots_are_pruned(snapshot_dir):
+    for count in range(app.SNAPSHOTS_TO_KEEP + 2):
+        name = app.build_index_snapshot(dict(SCRIPTS, extra=["Sign here"] * count), snapshot_dir)
+    kept = sorted(entry for entry in os.listdir(snapshot_dir) if entry.startswith("v"))
+    assert len(kept) == app.SNAPSHOTS_TO_KEEP
+    assert kept[-1] == name
+
+
+def test_empty_knowledge_base_in_a_fresh_directory(snapshot_dir):
+    name = app.build_index_snapshot({}, snapshot_dir)
+    corpus = load_corpus(snapshot_dir, name)
+    assert corpus.categories() == []
+    assert corpus.record_count == 0
+    assert corpus.search("anything") == set()